@@ -1,21 +1,55 @@
-import json
-from django.http import JsonResponse, HttpResponseForbidden
-from django.views.decorators.csrf import csrf_exempt
+import orjson
 
-from .models import Message
+from .models import Participant
+from django.core.cache import cache
+from django.db import connection
 from django.http import HttpResponse
 
-def render_to_json(content, **kwargs):
-  return HttpResponse(json.dumps(content), content_type='application/json', **kwargs)
+PARTICIPANTS_CACHE_TTL = 10
+PARTICIPANTS_PAGE_SIZE = 50
+
+class ORJsonResponse(HttpResponse):
+  """JSON response serialized straight to bytes with orjson."""
+
+  def __init__(self, data, **kwargs):
+    kwargs.setdefault('content_type', 'application/json')
+    super().__init__(orjson.dumps(data, default=str), **kwargs)
 
 def verify(request):
-  return render_to_json({'success': True})
+  return ORJsonResponse({'success': True})
 
 def list_users(request):
-    participants = (
-        Message.objects
-        .values_list("participant_email", flat=True)
-        .distinct()
-        .order_by("participant_email")
-    )
-    return JsonResponse(list(participants), safe=False)
\ No newline at end of file
+    after = request.GET.get("after")
+    if after:
+        return ORJsonResponse(participants_page(after))
+
+    # every admin dashboard load fetches the first page; keep it serialized in
+    # cache until it expires or a new participant shows up (see
+    # ChatConsumer.save_message)
+    blob = cache.get(Participant.LIST_CACHE_KEY)
+    if blob is None:
+        blob = orjson.dumps(participants_page())
+        cache.set(Participant.LIST_CACHE_KEY, blob, PARTICIPANTS_CACHE_TTL)
+    return HttpResponse(blob, content_type='application/json')
+
+def participants_page(after=None):
+    # keyset pagination on the primary key; fixed-shape query, so skip
+    # queryset compilation and row conversion. One extra row is read to
+    # tell the client whether another page exists.
+    table = connection.ops.quote_name(Participant._meta.db_table)
+    with connection.cursor() as cursor:
+        if after is None:
+            cursor.execute(
+                "SELECT email FROM %s ORDER BY email LIMIT %%s" % table,
+                [PARTICIPANTS_PAGE_SIZE + 1],
+            )
+        else:
+            cursor.execute(
+                "SELECT email FROM %s WHERE email > %%s ORDER BY email LIMIT %%s" % table,
+                [after, PARTICIPANTS_PAGE_SIZE + 1],
+            )
+        emails = [row[0] for row in cursor.fetchall()]
+    return {
+        "users": emails[:PARTICIPANTS_PAGE_SIZE],
+        "has_more": len(emails) > PARTICIPANTS_PAGE_SIZE,
+    }
@@ -4,9 +4,10 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'minicom.settings')
 django.setup()
 
+from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from minicom.routing import websocket_urlpatterns
 
 application = ProtocolTypeRouter({
-    "websocket": URLRouter(websocket_urlpatterns),
+    "websocket": AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
 })
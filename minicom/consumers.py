@@ -1,10 +1,78 @@
-import json
+import asyncio
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Message
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import Message, Participant
+
+HISTORY_PAGE_SIZE = 50
+MESSAGE_FIELDS = ("id", "sender_type", "content", "timestamp", "is_read")
+
+MESSAGE_JSON_CACHE_SIZE = 4096
+
+# Serialized messages keyed by id. Everything but is_read is immutable once
+# saved, so the JSON is cached without the flag and it is spliced back in
+# per send. Filled from both the event loop and DB threads, hence the lock.
+_message_json = OrderedDict()
+_message_json_lock = threading.Lock()
+
+def cache_message_json(message):
+    blob = orjson.dumps({k: v for k, v in message.items() if k != "is_read"})
+    with _message_json_lock:
+        _message_json[message["id"]] = blob
+        if len(_message_json) > MESSAGE_JSON_CACHE_SIZE:
+            _message_json.popitem(last=False)
+    return blob
+
+def cached_message_json(message_id):
+    with _message_json_lock:
+        blob = _message_json.get(message_id)
+        if blob is not None:
+            _message_json.move_to_end(message_id)
+        return blob
+
+def message_fragment(blob, is_read):
+    return orjson.Fragment(blob[:-1] + (b',"is_read":true}' if is_read else b',"is_read":false}'))
+
+def with_sender_names(messages):
+    names = Message.SENDER_NAMES
+    for m in messages:
+        m["sender_type"] = names[m["sender_type"]]
+    return messages
+
+def message_fragments(rows):
+    # (id, is_read) rows -> JSON fragments; uncached messages load in one query
+    blobs = {message_id: cached_message_json(message_id) for message_id, _ in rows}
+    missing = [message_id for message_id, blob in blobs.items() if blob is None]
+    if missing:
+        messages = with_sender_names(list(
+            Message.objects.filter(id__in=missing)
+            .values(*MESSAGE_FIELDS, email=F("participant_email"))
+        ))
+        for m in messages:
+            blobs[m["id"]] = cache_message_json(m)
+    return [message_fragment(blobs[message_id], is_read) for message_id, is_read in rows]
+
+def parse_message_id(value):
+    # client-supplied cursor -> positive id that fits a 64-bit column, else None
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value if 0 < value < 2 ** 63 else None
+
+_EMAIL_TABLE = str.maketrans({'@': '-at-', '+': '-plus-'})
 
 def sanitize_email(email: str) -> str:
-    return email.replace('@', '-at-').replace('+', '-plus-')
+    return email.translate(_EMAIL_TABLE)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -21,14 +89,31 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_add(self.user_room, self.channel_name)
 
         self.active_room = None
+        self._room_cache = {}
 
         await self.accept()
 
         if self.role == "user":
-            messages = await self.get_messages(self.email)
+            since = parse_qs(self.scope["query_string"].decode()).get("since")
+            since_id = parse_message_id(since[0]) if since else None
+            if since_id is not None:
+                # resumed connection: the client already has everything up to
+                # `since`; only send the delta if it fits in one page
+                messages, has_more = await self.get_messages(self.email, since_id=since_id)
+                if not has_more:
+                    await self.send_json({
+                        "type": "history",
+                        "messages": messages,
+                        "since": since_id,
+                    })
+                    return
+
+            # fresh connection, or too much missed to resume: send the latest page
+            messages, has_more = await self.get_messages(self.email)
             await self.send_json({
                 "type": "history",
-                "messages": messages
+                "messages": messages,
+                "has_more": has_more,
             })
 
 
@@ -40,25 +125,26 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_discard(self.active_room, self.channel_name)
 
 
-    async def receive(self, text_data=None):
-        data = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        data = orjson.loads(text_data if text_data is not None else bytes_data)
 
         if data.get("type") == "message" and self.role == "user":
             text = data.get("message", "").strip()
             if not text:
                 return
 
-            saved = await self.save_message(self.email, text, "user")
+            saved = await self.save_message(self.email, text, Message.USER)
+            cache_message_json(saved)
 
             await self.channel_layer.group_send(
                 self.user_room,
-                {"type": "chat_message", "message": saved}
+                {"type": "chat_message", "id": saved["id"]}
             )
 
             if self.active_room == self.user_room:
                 await self.channel_layer.group_send(
                     self.active_room,
-                    {"type": "chat_message", "message": saved}
+                    {"type": "chat_message", "id": saved["id"]}
                 )
 
 
@@ -68,17 +154,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             if not target or not text:
                 return
 
-            saved = await self.save_message(target, text, "admin")
-            target_room = f"user_{sanitize_email(target)}"
+            saved = await self.save_message(target, text, Message.ADMIN)
+            cache_message_json(saved)
+            target_room = self.room_for(target)
 
             await self.channel_layer.group_send(
                 target_room,
-                {"type": "chat_message", "message": saved}
+                {"type": "chat_message", "id": saved["id"]}
             )
 
         elif data.get("type") == "get_conversation" and self.role == "admin":
             target = data.get("email")
-            new_room = f"user_{sanitize_email(target)}"
+            new_room = self.room_for(target)
 
             if self.active_room:
                 await self.channel_layer.group_discard(self.active_room, self.channel_name)
@@ -86,39 +173,69 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_add(new_room, self.channel_name)
             self.active_room = new_room
 
-            messages = await self.get_messages(target)
+            messages, has_more = await self.get_messages(target)
             await self.send_json({
                 "type": "conversation",
                 "email": target,
-                "messages": messages
+                "messages": messages,
+                "has_more": has_more,
+            })
+
+        elif data.get("type") == "load_more":
+            target = self.email if self.role == "user" else data.get("email")
+            before_id = parse_message_id(data.get("before_id"))
+            if not target or before_id is None:
+                return
+
+            messages, has_more = await self.get_messages(target, before_id=before_id)
+            await self.send_json({
+                "type": "older_messages",
+                "email": target,
+                "messages": messages,
+                "has_more": has_more,
             })
 
         elif data.get("type") == "read_messages":
 
+            # the receipt broadcast doesn't depend on the UPDATE, so overlap them
             if self.role == "user":
-                await self.mark_messages_read(self.email, sender_type="admin")
-                
-                await self.channel_layer.group_send(
-                    self.user_room,
-                    {"type": "messages_read", "reader": "user", "email": self.email}
+                await asyncio.gather(
+                    self.mark_messages_read(self.email, sender_type=Message.ADMIN),
+                    self.channel_layer.group_send(
+                        self.user_room,
+                        {"type": "messages_read", "reader": "user", "email": self.email}
+                    ),
                 )
 
             elif self.role == "admin":
                 target = data.get("email")
                 if target:
-                    await self.mark_messages_read(target, sender_type="user")
-                    
-                    target_room = f"user_{sanitize_email(target)}"
-                    await self.channel_layer.group_send(
-                        target_room,
-                        {"type": "messages_read", "reader": "admin", "email": target}
+                    target_room = self.room_for(target)
+                    await asyncio.gather(
+                        self.mark_messages_read(target, sender_type=Message.USER),
+                        self.channel_layer.group_send(
+                            target_room,
+                            {"type": "messages_read", "reader": "admin", "email": target}
+                        ),
                     )
 
 
+    def room_for(self, email):
+        room = self._room_cache.get(email)
+        if room is None:
+            room = self._room_cache[email] = f"user_{sanitize_email(email)}"
+        return room
+
     async def chat_message(self, event):
+        blob = cached_message_json(event["id"])
+        if blob is None:
+            message = await self.get_message(event["id"])
+        else:
+            # broadcasts go out right after the save, before anyone has read it
+            message = message_fragment(blob, False)
         await self.send_json({
             "type": "message",
-            "message": event["message"]
+            "message": message
         })
 
     async def messages_read(self, event):
@@ -130,37 +247,54 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def save_message(self, email, text, sender_type):
-        msg = Message.objects.create(
-            participant_email=email,
-            sender_type=sender_type,
-            content=text
-        )
+        with transaction.atomic():
+            msg = Message.objects.create(
+                participant_email=email,
+                sender_type=sender_type,
+                content=text
+            )
+            _, created = Participant.objects.update_or_create(email=email)
+            if created:
+                transaction.on_commit(lambda: cache.delete(Participant.LIST_CACHE_KEY))
         return {
             "id": msg.id,
             "email": msg.participant_email,
-            "sender_type": msg.sender_type,
+            "sender_type": Message.SENDER_NAMES[msg.sender_type],
             "content": msg.content,
-            "timestamp": msg.timestamp.isoformat(),
+            "timestamp": msg.timestamp,
             "is_read": msg.is_read,
         }
 
     @database_sync_to_async
-    def get_messages(self, email):
+    def get_message(self, message_id):
+        message = Message.objects.values(
+            *MESSAGE_FIELDS, email=F("participant_email")
+        ).get(id=message_id)
+        with_sender_names([message])
+        return message_fragment(cache_message_json(message), message["is_read"])
+
+    @database_sync_to_async
+    def get_messages(self, email, before_id=None, since_id=None, limit=HISTORY_PAGE_SIZE):
+        # returns (messages, has_more); one row past the page is read to tell
+        # whether another page exists
         msgs = Message.objects.filter(
             participant_email=email
-        ).order_by("timestamp")
-
-        return [
-            {
-                "id": m.id,
-                "email": m.participant_email,
-                "sender_type": m.sender_type,
-                "content": m.content,
-                "timestamp": m.timestamp.isoformat(),
-                "is_read": m.is_read,
-            }
-            for m in msgs
-        ]
+        )
+        if since_id is not None:
+            rows = list(
+                msgs.filter(id__gt=since_id)
+                .order_by("id")
+                .values_list("id", "is_read")[:limit + 1]
+            )
+            return message_fragments(rows[:limit]), len(rows) > limit
+        if before_id is not None:
+            msgs = msgs.filter(id__lt=before_id)
+
+        rows = list(msgs.order_by("-id").values_list("id", "is_read")[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return message_fragments(rows), has_more
 
     @database_sync_to_async
     def mark_messages_read(self, participant_email, sender_type):
@@ -171,4 +305,4 @@ class ChatConsumer(AsyncWebsocketConsumer):
         ).update(is_read=True)
 
     async def send_json(self, payload):
-        await self.send(text_data=json.dumps(payload))
+        await self.send(text_data=orjson.dumps(payload).decode())
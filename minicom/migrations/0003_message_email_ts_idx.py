@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-15 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minicom', '0002_message_is_read'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['participant_email', 'timestamp'], name='msg_email_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-15 03:55
+
+from django.db import migrations, models
+
+
+def backfill_participants(apps, schema_editor):
+    Message = apps.get_model('minicom', 'Message')
+    Participant = apps.get_model('minicom', 'Participant')
+    emails = Message.objects.values_list('participant_email', flat=True).distinct().order_by()
+    Participant.objects.bulk_create(Participant(email=email) for email in emails)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minicom', '0003_message_email_ts_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Participant',
+            fields=[
+                ('email', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
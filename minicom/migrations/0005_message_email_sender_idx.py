@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-15 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minicom', '0004_participant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['participant_email', 'sender_type'], name='msg_email_sender_idx'),
+        ),
+    ]
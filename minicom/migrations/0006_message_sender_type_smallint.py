@@ -0,0 +1,66 @@
+# Generated by Django 2.2.13 on 2026-10-15 04:00
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+SENDER_CHOICES = [(0, 'user'), (1, 'admin')]
+
+
+def to_codes(apps, schema_editor):
+    Message = apps.get_model('minicom', 'Message')
+    Message.objects.update(sender_code=Case(
+        When(sender_type='admin', then=Value(1)),
+        default=Value(0),
+    ))
+
+
+def to_names(apps, schema_editor):
+    Message = apps.get_model('minicom', 'Message')
+    Message.objects.update(sender_type=Case(
+        When(sender_code=1, then=Value('admin')),
+        default=Value('user'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minicom', '0005_message_email_sender_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='msg_email_sender_idx',
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sender_code',
+            field=models.PositiveSmallIntegerField(choices=SENDER_CHOICES, default=0),
+        ),
+        migrations.RunPython(to_codes, to_names),
+        # give the old column a default so reversing the RemoveField can re-add it
+        migrations.AlterField(
+            model_name='message',
+            name='sender_type',
+            field=models.CharField(choices=[('admin', 'Admin'), ('user', 'User')], default='user', max_length=5),
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='sender_type',
+        ),
+        migrations.RenameField(
+            model_name='message',
+            old_name='sender_code',
+            new_name='sender_type',
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='sender_type',
+            field=models.PositiveSmallIntegerField(choices=SENDER_CHOICES),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['participant_email', 'sender_type'], name='msg_email_sender_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-15 04:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('minicom', '0006_message_sender_type_smallint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='msg_email_ts_idx',
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.db import models
-from django.contrib.auth.models import User
 
 
 class Message(models.Model):
+    USER = 0
+    ADMIN = 1
+    SENDER_CHOICES = [(USER, 'user'), (ADMIN, 'admin')]
+    # stored as a small int, exposed as its name in API payloads
+    SENDER_NAMES = dict(SENDER_CHOICES)
+
     participant_email = models.CharField(max_length=255, db_index=True)
-    sender_type = models.CharField(max_length=5, choices=[('admin','Admin'),('user','User')])
+    sender_type = models.PositiveSmallIntegerField(choices=SENDER_CHOICES)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
@@ -12,7 +17,21 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['participant_email', 'sender_type'], name='msg_email_sender_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.sender_type}: {self.content[:50]}"
-    
+        return f"{self.get_sender_type_display()}: {self.content[:50]}"
+
+
+class Participant(models.Model):
+    # cache entry for the serialized participant list; api.list_users fills
+    # it and the message save path drops it when a participant is created
+    LIST_CACHE_KEY = 'participants_json'
+
+    email = models.CharField(max_length=255, primary_key=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.email
@@ -56,6 +56,11 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 ]
 
+# Serve session reads from the cache and fall back to django_session only
+# on a miss. Not signed_cookies: SECRET_KEY is committed above, so anyone
+# could forge a cookie session.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 ROOT_URLCONF = 'minicom.urls'
 
 TEMPLATES = [
@@ -80,6 +85,10 @@ WSGI_APPLICATION = 'minicom.wsgi.application'
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND":"channels.layers.InMemoryChannelLayer",
+        # broadcasts only carry message ids, so undelivered ones can expire fast
+        "CONFIG": {
+            "expiry": 10,
+        },
     },
 }
 
@@ -1,6 +1,6 @@
 # minicom/urls.py
 from django.urls import path
-from minicom import api, views
+from minicom import api
 
 urlpatterns = [
     path('api/users/', api.list_users),
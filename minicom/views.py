@@ -1,8 +1 @@
-from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponseForbidden
-from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from django.db.models import Q
-import json
-
-
+# Views are served by api.py (HTTP) and consumers.py (websocket).